@@ -1,10 +1,22 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List
 from backend.schemas.chatSchemas import ChatRequest, ChatResponse, ChatHistoryResponse, BookingRequest, BookingResponse
 from backend.db.database import BookingInfo
+from sqlalchemy import insert, text
 
-from backend.services.services import memory_manager, rag_service, db_manager
+from backend.db.chatMemory import RedisMemoryManager
+from backend.db.database import DatabaseManager
+from backend.llmModels.rag import CustomRAGService
+from backend.services.services import (
+    get_db_manager, get_embedding_service, get_llm_service,
+    get_memory_manager, get_vector_store,
+    db_manager_dep, memory_manager_dep, rag_service_dep
+)
 
+from datetime import datetime
+import asyncio
+import orjson
 import uuid
 import logging
 
@@ -12,8 +24,33 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1", tags=["chat"])
 
+# Compiled once; bare string SQL is rejected by SQLAlchemy 2.x
+_PING = text("SELECT 1")
+
+
+def _make_preview(text: str, length: int = 200) -> str:
+    """Trim chunk text for display; used for chunks ingested without a stored preview."""
+    return text[:length] + "..." if len(text) > length else text
+
+
+def _format_sources(sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Format retrieved chunks for API responses."""
+    return [
+        {
+            "chunk_id": src["chunk_id"],
+            "filename": src["filename"],
+            "relevance_score": round(src["score"], 3),
+            "preview": src.get("preview") or _make_preview(src["text"])
+        }
+        for src in sources
+    ]
+
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest) -> ChatResponse:
+async def chat(
+    request: ChatRequest,
+    rag_service: CustomRAGService = Depends(rag_service_dep)
+) -> ChatResponse:
     """
     Handle conversational chat with RAG support.
     
@@ -29,36 +66,64 @@ async def chat(request: ChatRequest) -> ChatResponse:
         response_text, sources = await rag_service.generate_response(
             session_id=request.session_id,
             query=request.message,
-            use_rag=request.use_rag
+            use_rag=request.use_rag,
+            use_cache=request.use_cache
         )
         
-        # Format sources for response
-        formatted_sources = [
-            {
-                "chunk_id": src["chunk_id"],
-                "filename": src["filename"],
-                "relevance_score": round(src["score"], 3),
-                "preview": src["text"][:200] + "..." if len(src["text"]) > 200 else src["text"]
-            }
-            for src in sources
-        ]
-        
         return ChatResponse(
             session_id=request.session_id,
             message=response_text,
-            sources=formatted_sources
+            sources=_format_sources(sources)
+        )
+    
+    except Exception as e:
+        logger.error(f"Chat error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate response: {str(e)}"
         )
+
+
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    rag_service: CustomRAGService = Depends(rag_service_dep)
+) -> StreamingResponse:
+    """
+    Handle conversational chat with a streamed response.
     
+    Streams newline-delimited JSON: first {"sources": [...]}, then one
+    {"token": "..."} object per generated chunk.
+    """
+    try:
+        logger.info(f"Chat stream request - Session: {request.session_id}")
+        
+        tokens, sources = await rag_service.generate_response_stream(
+            session_id=request.session_id,
+            query=request.message,
+            use_rag=request.use_rag,
+            use_cache=request.use_cache
+        )
     except Exception as e:
         logger.error(f"Chat error: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to generate response: {str(e)}"
         )
+    
+    async def body():
+        yield orjson.dumps({"sources": _format_sources(sources)}) + b"\n"
+        async for token in tokens:
+            yield orjson.dumps({"token": token}) + b"\n"
+    
+    return StreamingResponse(body(), media_type="application/x-ndjson")
 
 
 @router.post("/bookings", response_model=BookingResponse)
-async def create_booking(request: BookingRequest) -> BookingResponse:
+async def create_booking(
+    request: BookingRequest,
+    db_manager: DatabaseManager = Depends(db_manager_dep)
+) -> BookingResponse:
     """
     Create an interview booking.
     
@@ -72,21 +137,24 @@ async def create_booking(request: BookingRequest) -> BookingResponse:
         # Generate booking ID
         booking_id = str(uuid.uuid4())
         
-        # Create booking record
-        booking = BookingInfo(
-            id=booking_id,
-            session_id=request.session_id,
-            name=request.name,
-            email=request.email,
-            preferred_date=request.preferred_date,
-            preferred_time=request.preferred_time,
-            notes=request.notes,
-            status="pending"
-        )
+        # Create booking record, reading created_at back via RETURNING
         async with db_manager.session_factory() as db_session:
-            db_session.add(booking)
+            result = await db_session.execute(
+                insert(BookingInfo)
+                .values(
+                    id=booking_id,
+                    session_id=request.session_id,
+                    name=request.name,
+                    email=request.email,
+                    preferred_date=request.preferred_date,
+                    preferred_time=request.preferred_time,
+                    notes=request.notes,
+                    status="pending"
+                )
+                .returning(BookingInfo.created_at)
+            )
+            created_at = result.scalar_one()
             await db_session.commit()
-            await db_session.refresh(booking)
         
         logger.info(f"Booking created: {booking_id}")
         
@@ -98,7 +166,7 @@ async def create_booking(request: BookingRequest) -> BookingResponse:
             preferred_date=request.preferred_date,
             preferred_time=request.preferred_time,
             status="pending",
-            created_at=booking.created_at,
+            created_at=created_at,
             message="Interview booking created successfully. You will receive a confirmation email shortly."
         )
     
@@ -115,6 +183,7 @@ async def create_booking(request: BookingRequest) -> BookingResponse:
 async def get_chat_history(
     session_id: str,
     limit: int = 20,
+    memory_manager: RedisMemoryManager = Depends(memory_manager_dep)
 ) -> ChatHistoryResponse:
     """Get conversation history for a session."""
     try:
@@ -135,6 +204,7 @@ async def get_chat_history(
 @router.delete("/chat/history/{session_id}" ,response_model= None)
 async def clear_chat_history(
     session_id: str,
+    memory_manager: RedisMemoryManager = Depends(memory_manager_dep)
 ) -> dict:
     """Clear conversation history for a session."""
     try:
@@ -149,66 +219,70 @@ async def clear_chat_history(
             detail=f"Failed to clear history: {str(e)}"
         )
 
+async def _check_database() -> str:
+    async with get_db_manager().session_factory() as session:
+        await session.execute(_PING)
+    return "Connected"
+
+
+async def _check_redis() -> str:
+    test_key = "health_check_test"
+    memory_manager = get_memory_manager()
+    await memory_manager.add_message(test_key, "system", "ok")
+    await memory_manager.clear_history(test_key)
+    return "Connected"
+
+
+async def _check_vector_store() -> str:
+    if getattr(get_vector_store(), "client", None) is not None:
+        return "Initialized"
+    return "Unknown state"
+
+
+async def _check_llm() -> str:
+    if get_llm_service() is not None:
+        return "Ready"
+    return "Not initialized"
+
+
+async def _check_embedding_model() -> str:
+    return f"✅ {get_embedding_service().model_name}"
+
+
+# Component name -> (probe, whether a failure degrades overall status)
+HEALTH_PROBES = {
+    "database": (_check_database, True),
+    "redis_memory": (_check_redis, True),
+    "vector_db": (_check_vector_store, True),
+    "llm_service": (_check_llm, True),
+    "embedding_model": (_check_embedding_model, False),
+}
+
+
 @router.get("/health", tags=["system"])
 async def health_check() -> Dict[str, Any]:
     """
     Health check endpoint for all core services.
     Verifies DB, Redis, Vector Store, and LLM readiness.
+    Probes run concurrently, so latency is that of the slowest component.
     """
-    from datetime import datetime
-    import asyncio
-
     health_status = {
         "timestamp": datetime.utcnow().isoformat(),
         "status": "healthy",
         "components": {}
     }
 
-    try:
-        # Check Database
-        async with db_manager.session_factory() as session:
-            await session.execute("SELECT 1")
-        health_status["components"]["database"] = "Connected"
-    except Exception as e:
-        health_status["components"]["database"] = f"Error: {str(e)}"
-        health_status["status"] = "degraded"
-
-    try:
-        # Check Redis Memory Manager
-        test_key = "health_check_test"
-        await memory_manager.set_message(test_key, {"test": "ok"})
-        await memory_manager.clear_history(test_key)
-        health_status["components"]["redis_memory"] = "Connected"
-    except Exception as e:
-        health_status["components"]["redis_memory"] = f"Error: {str(e)}"
-        health_status["status"] = "degraded"
+    results = await asyncio.gather(
+        *(probe() for probe, _ in HEALTH_PROBES.values()),
+        return_exceptions=True
+    )
 
-    try:
-        # Check Vector Store (if it has async or sync test)
-        if hasattr(rag_service.vector_store, "client"):
-            health_status["components"]["vector_db"] = "Initialized"
+    for (name, (_, critical)), result in zip(HEALTH_PROBES.items(), results):
+        if isinstance(result, Exception):
+            health_status["components"][name] = f"Error: {str(result)}"
+            if critical:
+                health_status["status"] = "degraded"
         else:
-            health_status["components"]["vector_db"] = "Unknown state"
-    except Exception as e:
-        health_status["components"]["vector_db"] = f"Error: {str(e)}"
-        health_status["status"] = "degraded"
-
-    try:
-        # Check LLM service
-        if rag_service.llm_service is not None:
-            health_status["components"]["llm_service"] = "Ready"
-        else:
-            health_status["components"]["llm_service"] = "Not initialized"
-    except Exception as e:
-        health_status["components"]["llm_service"] = f"Error: {str(e)}"
-        health_status["status"] = "degraded"
-
-    try:
-        # Embedding Model
-        health_status["components"]["embedding_model"] = (
-            f"✅ {rag_service.embedding_service.model_name}"
-        )
-    except Exception as e:
-        health_status["components"]["embedding_model"] = f"Error: {str(e)}"
+            health_status["components"][name] = result
 
-    return health_status
\ No newline at end of file
+    return health_status
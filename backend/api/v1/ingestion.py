@@ -1,15 +1,24 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, APIRouter, Form
-from typing import Optional
+from fastapi import FastAPI, UploadFile, File, HTTPException, APIRouter, Form, BackgroundTasks, Response, Depends
+from typing import Any, Dict, List, Optional
 from pathlib import Path
+from io import BytesIO
 
 # Add parent directory to path for imports
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
-from backend.schemas.model import DocumentUploadResponse
-from backend.services.text_processing import  ChunkingService
-from backend.services.services import db_manager, vector_store, embedding_service, text_extractor, settings
+from backend.schemas.model import DocumentUploadResponse, EmbeddingBatchResponse
+from backend.services.text_processing import TextExtractor, extract_text_sync, chunk_text_sync
+from backend.db.database import DatabaseManager
+from backend.db.vector import VectorStore
+from backend.services.embedding import EmbeddingService
+from backend.services.services import (
+    get_db_manager, get_embedding_service, get_process_executor, get_vector_store, settings,
+    db_manager_dep, embedding_service_dep, vector_store_dep
+)
+import asyncio
 import logging
+import os
 import uuid
 
 
@@ -19,12 +28,54 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1", tags=["ingestion"])
 
+# Size of each read from the uploaded file stream
+UPLOAD_READ_CHUNK_SIZE = 64 * 1024
+
+# Length of the chunk preview stored alongside each vector
+CHUNK_PREVIEW_LENGTH = 200
+
+
+def generate_chunk_ids(count: int) -> List[str]:
+    """Generate random UUID4 strings from a single os.urandom call."""
+    raw = os.urandom(16 * count)
+    return [
+        str(uuid.UUID(bytes=raw[i * 16:(i + 1) * 16], version=4))
+        for i in range(count)
+    ]
+
+
+async def process_embedding_batch(
+    batch_id: str,
+    chunks: List[str],
+    chunk_ids: List[str],
+    metadata: List[Dict[str, Any]]
+) -> None:
+    """Generate embeddings and upsert them to the vector store in the background."""
+    db_manager = get_db_manager()
+    embedding_service = get_embedding_service()
+    vector_store = get_vector_store()
+    try:
+        await db_manager.update_embedding_batch_status(batch_id, "processing")
+        embeddings = await embedding_service.generate_embeddings(chunks)
+        # Wait for the points to be applied so "completed" means searchable
+        await vector_store.upsert_vectors(embeddings, chunk_ids, metadata, wait=True)
+        await db_manager.update_embedding_batch_status(batch_id, "completed")
+        logger.info(f"Embedding batch {batch_id} completed")
+    except Exception as e:
+        logger.error(f"Embedding batch {batch_id} failed: {str(e)}", exc_info=True)
+        try:
+            await db_manager.update_embedding_batch_status(batch_id, "failed", error=str(e))
+        except Exception as status_error:
+            logger.error(f"Failed to mark embedding batch {batch_id} as failed: {str(status_error)}")
+
 @router.post(
     "/api/v1/documents/upload",
     response_model=DocumentUploadResponse,
     status_code=201
 )
 async def upload_document(
+    response: Response,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(..., description="PDF or TXT file to upload"),
     chunking_strategy: str = Form(
         default="fixed",
@@ -37,7 +88,14 @@ async def upload_document(
     chunk_overlap: Optional[int] = Form(
         default=None,
         description="Custom chunk overlap (optional)"
-    )
+    ),
+    async_batch: bool = Form(
+        default=False,
+        description="Generate embeddings in a background batch and return 202 immediately"
+    ),
+    db_manager: DatabaseManager = Depends(db_manager_dep),
+    vector_store: VectorStore = Depends(vector_store_dep),
+    embedding_service: EmbeddingService = Depends(embedding_service_dep)
 ) -> DocumentUploadResponse:
     """
     Upload and process a document.
@@ -46,6 +104,9 @@ async def upload_document(
     - Chunks text using selected strategy
     - Generates embeddings
     - Stores in vector database and metadata DB
+    
+    With async_batch, embedding and vector upserts run as a background job
+    tracked in the embedding_batches table; poll the returned batch_id.
     """
     
     # Validate file type
@@ -55,25 +116,37 @@ async def upload_document(
             detail="Only .pdf and .txt files are supported"
         )
     
-    # Validate file size
-    file_content = await file.read()
-    file_size_mb = len(file_content) / (1024 * 1024)
-    
-    if file_size_mb > settings.max_file_size_mb:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File size exceeds maximum allowed size of {settings.max_file_size_mb}MB"
-        )
+    # Read in chunks and validate file size, aborting as soon as the limit is exceeded
+    max_bytes = settings.max_file_size_mb * 1024 * 1024
+    buffer = BytesIO()
+    total_bytes = 0
+    while chunk := await file.read(UPLOAD_READ_CHUNK_SIZE):
+        total_bytes += len(chunk)
+        if total_bytes > max_bytes:
+            raise HTTPException(
+                status_code=400,
+                detail=f"File size exceeds maximum allowed size of {settings.max_file_size_mb}MB"
+            )
+        buffer.write(chunk)
+    file_content = buffer.getvalue()
     
     try:
-        # Extract text
+        loop = asyncio.get_running_loop()
+        process_executor = get_process_executor()
+        
         logger.info(f"Extracting text from {file.filename}")
-        if file.filename.endswith('.pdf'):
-            text = await text_extractor.extract_from_pdf(file_content)
-            file_type = "pdf"
+        file_type = "pdf" if file.filename.endswith('.pdf') else "txt"
+        if file_type == "pdf":
+            # Parse PDFs in the process pool so parsing does not block the event loop
+            text = await loop.run_in_executor(
+                process_executor,
+                extract_text_sync,
+                file_content,
+                file_type
+            )
         else:
-            text = await text_extractor.extract_from_txt(file_content)
-            file_type = "txt"
+            # Decoding is cheap; not worth pickling the bytes to a worker
+            text = TextExtractor.extract_txt_sync(file_content)
         
         if not text.strip():
             raise HTTPException(
@@ -83,11 +156,15 @@ async def upload_document(
         
         # Chunk text
         logger.info(f"Chunking text using {chunking_strategy} strategy")
-        chunking_service = ChunkingService(
-            chunk_size=chunk_size or settings.chunk_size,
-            chunk_overlap=chunk_overlap or settings.chunk_overlap
+        chunks = await loop.run_in_executor(
+            process_executor,
+            chunk_text_sync,
+            text,
+            chunking_strategy,
+            chunk_size or settings.chunk_size,
+            chunk_overlap or settings.chunk_overlap,
+            settings.embedding_model
         )
-        chunks = await chunking_service.chunk_text(text, chunking_strategy)
         
         if not chunks:
             raise HTTPException(
@@ -99,47 +176,66 @@ async def upload_document(
         document_id = str(uuid.uuid4())
         print(document_id)
         
-        # Generate embeddings
-        logger.info(f"Generating embeddings for {len(chunks)} chunks")
-        embeddings = await embedding_service.generate_embeddings(chunks)
-        
         # Prepare metadata for vector store
-        chunk_ids = [str(uuid.uuid4()) for _ in range(len(chunks))] 
+        chunk_ids = generate_chunk_ids(len(chunks))
         metadata = [
             {
                 "document_id": document_id,
                 "chunk_index": idx,
                 "chunk_text": chunks[idx],
+                "chunk_preview": (
+                    chunks[idx][:CHUNK_PREVIEW_LENGTH] + "..."
+                    if len(chunks[idx]) > CHUNK_PREVIEW_LENGTH else chunks[idx]
+                ),
                 "filename": file.filename,
                 "file_type": file_type
             }
             for idx in range(len(chunks))
         ]
         
-        # Store in vector database
-        logger.info("Storing vectors in vector database")
-        await vector_store.upsert_vectors(embeddings, chunk_ids, metadata)
+        batch_id = None
+        if not async_batch:
+            # Generate embeddings
+            logger.info(f"Generating embeddings for {len(chunks)} chunks")
+            embeddings = await embedding_service.generate_embeddings(chunks)
+            
+            # Store in vector database
+            logger.info("Storing vectors in vector database")
+            await vector_store.upsert_vectors(embeddings, chunk_ids, metadata)
         
         # Store metadata in SQL database
         logger.info("Storing metadata in database")
         async with db_manager.get_session() as session:
-            doc_metadata = await db_manager.save_document_metadata(
+            upload_timestamp = await db_manager.save_document_and_chunks(
                 session=session,
                 document_id=document_id,
                 filename=file.filename,
                 file_type=file_type,
                 file_size=len(file_content),
                 chunking_strategy=chunking_strategy,
-                total_chunks=len(chunks)
+                chunks=chunks,
+                chunk_ids=chunk_ids
             )
             
-            await db_manager.save_chunks(
-                session=session,
-                document_id=document_id,
-                chunks=chunks
-            )
+            if async_batch:
+                batch_id = str(uuid.uuid4())
+                await db_manager.create_embedding_batch(
+                    session=session,
+                    batch_id=batch_id,
+                    document_id=document_id,
+                    total_chunks=len(chunks)
+                )
         
-        logger.info(f"Document {document_id} processed successfully")
+        if async_batch:
+            background_tasks.add_task(
+                process_embedding_batch, batch_id, chunks, chunk_ids, metadata
+            )
+            response.status_code = 202
+            logger.info(f"Document {document_id} accepted, embedding batch {batch_id} queued")
+            message = "Document uploaded; embeddings are being generated in the background"
+        else:
+            logger.info(f"Document {document_id} processed successfully")
+            message = "Document uploaded and processed successfully"
         
         return DocumentUploadResponse(
             document_id=document_id,
@@ -148,8 +244,9 @@ async def upload_document(
             file_size=len(file_content),
             chunking_strategy=chunking_strategy,
             total_chunks=len(chunks),
-            upload_timestamp=doc_metadata.upload_timestamp,
-            message="Document uploaded and processed successfully"
+            upload_timestamp=upload_timestamp,
+            message=message,
+            batch_id=batch_id
         )
     
     except HTTPException:
@@ -162,6 +259,33 @@ async def upload_document(
         )
 
 
+@router.get(
+    "/api/v1/documents/batches/{batch_id}",
+    response_model=EmbeddingBatchResponse
+)
+async def get_embedding_batch(
+    batch_id: str,
+    db_manager: DatabaseManager = Depends(db_manager_dep)
+) -> EmbeddingBatchResponse:
+    """Get the status of a background embedding batch."""
+    batch = await db_manager.get_embedding_batch(batch_id)
+    if batch is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Embedding batch {batch_id} not found"
+        )
+    
+    return EmbeddingBatchResponse(
+        batch_id=batch.id,
+        document_id=batch.document_id,
+        status=batch.status,
+        total_chunks=batch.total_chunks,
+        error=batch.error,
+        created_at=batch.created_at,
+        completed_at=batch.completed_at
+    )
+
+
 @router.get("/api/v1/health")
 async def health_check():
     """Health check endpoint."""
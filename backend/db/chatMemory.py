@@ -1,8 +1,29 @@
-import json
-from typing import List, Optional
+import msgpack
+import orjson
+import zstandard
+from functools import lru_cache
+from typing import Dict, List, Optional
 import redis.asyncio as redis
 from datetime import datetime
 
+# Stored messages are msgpack-encoded and zstd-compressed (level 1). Both
+# objects are reused across calls; they are only used from the event loop.
+_compressor = zstandard.ZstdCompressor(level=1)
+_decompressor = zstandard.ZstdDecompressor()
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _encode_message(message: dict) -> bytes:
+    """Serialize a message for storage in Redis."""
+    return _compressor.compress(msgpack.packb(message))
+
+
+def _decode_message(raw: bytes) -> dict:
+    """Deserialize a stored message; entries written before compression are JSON."""
+    if raw.startswith(_ZSTD_MAGIC):
+        return msgpack.unpackb(_decompressor.decompress(raw))
+    return orjson.loads(raw)
+
 
 class RedisMemoryManager:
     """Manages conversation history using Redis."""
@@ -28,8 +49,7 @@ class RedisMemoryManager:
             host=self.host,
             port=self.port,
             db=self.db,
-            password=self.password if self.password else None,
-            decode_responses=True
+            password=self.password if self.password else None
         )
         # Test connection
         await self.client.ping()
@@ -39,7 +59,9 @@ class RedisMemoryManager:
         if self.client:
             await self.client.close()
     
-    def _get_key(self, session_id: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _get_key(session_id: str) -> str:
         """Generate Redis key for session."""
         return f"chat_session:{session_id}"
     
@@ -58,11 +80,37 @@ class RedisMemoryManager:
             "timestamp": datetime.utcnow().isoformat()
         }
         
-        # Add to Redis list
-        await self.client.rpush(key, json.dumps(message))
+        # Append and refresh expiration in a single round trip
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, _encode_message(message))
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+    
+    async def add_messages(
+        self,
+        session_id: str,
+        messages: List[Dict[str, str]]
+    ) -> None:
+        """Add several messages (dicts with role and content) in one round trip."""
+        if not messages:
+            return
+        
+        key = self._get_key(session_id)
+        timestamp = datetime.utcnow().isoformat()
         
-        # Set expiration
-        await self.client.expire(key, self.ttl)
+        payloads = [
+            _encode_message({
+                "role": msg["role"],
+                "content": msg["content"],
+                "timestamp": timestamp
+            })
+            for msg in messages
+        ]
+        
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, *payloads)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
     
     async def get_history(
         self,
@@ -81,7 +129,7 @@ class RedisMemoryManager:
         else:
             messages = await self.client.lrange(key, 0, -1)
         
-        return [json.loads(msg) for msg in messages]
+        return [_decode_message(msg) for msg in messages]
     
     async def clear_history(self, session_id: str) -> None:
         """Clear conversation history for session."""
@@ -104,10 +152,6 @@ class RedisMemoryManager:
         if not history:
             return ""
         
-        context_parts = []
-        for msg in history:
-            role = msg["role"].title()
-            content = msg["content"]
-            context_parts.append(f"{role}: {content}")
-        
-        return "\n\n".join(context_parts)
+        return "\n\n".join(
+            f"{msg['role'].title()}: {msg['content']}" for msg in history
+        )
@@ -1,17 +1,43 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
-from backend.schemas.model import DocumentMetadata, ChunkMetadata, Base
-from typing import List
-from sqlalchemy import Column, String, DateTime, Text
+from backend.schemas.model import DocumentMetadata, ChunkMetadata, EmbeddingBatch, Base
+from typing import Dict, List, Optional
+from sqlalchemy import Column, String, DateTime, Text, insert, update, select
 from datetime import datetime
 
+# Maximum number of chunk rows sent per INSERT statement
+CHUNK_INSERT_BATCH_SIZE = 1000
+
 
 class DatabaseManager:
     """Async database manager for PostgreSQL."""
     
-    def __init__(self, database_url: str):
-        self.engine = create_async_engine(database_url, echo=False)
+    def __init__(
+        self,
+        database_url: str,
+        pool_size: int = 20,
+        max_overflow: int = 10,
+        pool_timeout: int = 30,
+        pool_recycle: int = 1800,
+        pool_pre_ping: bool = True,
+        behind_pgbouncer: bool = False
+    ):
+        connect_args = {}
+        if behind_pgbouncer and "asyncpg" in database_url:
+            # PgBouncer in transaction mode cannot hold asyncpg prepared statements
+            connect_args["statement_cache_size"] = 0
+        
+        self.engine = create_async_engine(
+            database_url,
+            echo=False,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+            connect_args=connect_args
+        )
         self.session_factory = async_sessionmaker(
             self.engine,
             class_=AsyncSession,
@@ -62,21 +88,137 @@ class DatabaseManager:
         self,
         session: AsyncSession,
         document_id: str,
-        chunks: List[str]
+        chunks: List[str],
+        chunk_ids: Optional[List[str]] = None
     ) -> None:
-        """Save chunk metadata to database."""
-        chunk_objects = [
-            ChunkMetadata(
-                id=f"{document_id}_chunk_{idx}",
-                document_id=document_id,
-                chunk_index=idx,
-                chunk_text=chunk_text,
-                chunk_size=len(chunk_text)
-            )
+        """
+        Save chunk metadata to database using bulk multi-row inserts.
+        
+        Pass the vector store point IDs as chunk_ids so chunks can be
+        looked up by search result ID.
+        """
+        chunk_rows = [
+            {
+                "id": chunk_ids[idx] if chunk_ids else f"{document_id}_chunk_{idx}",
+                "document_id": document_id,
+                "chunk_index": idx,
+                "chunk_text": chunk_text,
+                "chunk_size": len(chunk_text)
+            }
             for idx, chunk_text in enumerate(chunks)
         ]
-        session.add_all(chunk_objects)
+        for start in range(0, len(chunk_rows), CHUNK_INSERT_BATCH_SIZE):
+            await session.execute(
+                insert(ChunkMetadata),
+                chunk_rows[start:start + CHUNK_INSERT_BATCH_SIZE]
+            )
+
+    
+    async def save_document_and_chunks(
+        self,
+        session: AsyncSession,
+        document_id: str,
+        filename: str,
+        file_type: str,
+        file_size: int,
+        chunking_strategy: str,
+        chunks: List[str],
+        chunk_ids: Optional[List[str]] = None
+    ) -> datetime:
+        """
+        Save document metadata and its chunks with Core inserts.
+        
+        Returns the document's upload timestamp via INSERT ... RETURNING,
+        so no ORM flush or refresh is needed.
+        """
+        result = await session.execute(
+            insert(DocumentMetadata)
+            .values(
+                id=document_id,
+                filename=filename,
+                file_type=file_type,
+                file_size=file_size,
+                chunking_strategy=chunking_strategy,
+                total_chunks=len(chunks)
+            )
+            .returning(DocumentMetadata.upload_timestamp)
+        )
+        upload_timestamp = result.scalar_one()
+        
+        await self.save_chunks(
+            session=session,
+            document_id=document_id,
+            chunks=chunks,
+            chunk_ids=chunk_ids
+        )
+        return upload_timestamp
+    
+    async def get_chunks_by_ids(self, chunk_ids: List[str]) -> Dict[str, dict]:
+        """Fetch chunk text and source filename for many chunks in one query."""
+        if not chunk_ids:
+            return {}
+        
+        stmt = (
+            select(
+                ChunkMetadata.id,
+                ChunkMetadata.chunk_text,
+                ChunkMetadata.document_id,
+                DocumentMetadata.filename
+            )
+            .join(DocumentMetadata, DocumentMetadata.id == ChunkMetadata.document_id)
+            .where(ChunkMetadata.id.in_(chunk_ids))
+        )
+        async with self.session_factory() as session:
+            result = await session.execute(stmt)
+            return {
+                row.id: {
+                    "chunk_text": row.chunk_text,
+                    "document_id": row.document_id,
+                    "filename": row.filename
+                }
+                for row in result
+            }
+    
+    async def create_embedding_batch(
+        self,
+        session: AsyncSession,
+        batch_id: str,
+        document_id: str,
+        total_chunks: int
+    ) -> EmbeddingBatch:
+        """Record a pending background embedding job."""
+        batch = EmbeddingBatch(
+            id=batch_id,
+            document_id=document_id,
+            status="pending",
+            total_chunks=total_chunks
+        )
+        session.add(batch)
         await session.flush()
+        return batch
+    
+    async def update_embedding_batch_status(
+        self,
+        batch_id: str,
+        status: str,
+        error: Optional[str] = None
+    ) -> None:
+        """Update the status of a background embedding job."""
+        values = {"status": status, "error": error}
+        if status in ("completed", "failed"):
+            values["completed_at"] = datetime.utcnow()
+        
+        async with self.get_session() as session:
+            await session.execute(
+                update(EmbeddingBatch)
+                .where(EmbeddingBatch.id == batch_id)
+                .values(**values)
+            )
+    
+    async def get_embedding_batch(self, batch_id: str) -> Optional[EmbeddingBatch]:
+        """Fetch a background embedding job by ID."""
+        async with self.session_factory() as session:
+            return await session.get(EmbeddingBatch, batch_id)
 
 
 ####################### Additional Model for Bookings #########################
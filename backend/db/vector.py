@@ -1,9 +1,18 @@
 
+import asyncio
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional
 
+import numpy as np
+
 from config.settings import Settings
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue,
+    HnswConfigDiff, ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    ProductQuantization, ProductQuantizationConfig, CompressionRatio,
+    PayloadSchemaType, SearchParams, QuantizationSearchParams
+)
 
 
 class VectorStore(ABC):
@@ -17,11 +26,12 @@ class VectorStore(ABC):
     @abstractmethod
     async def upsert_vectors(
         self,
-        vectors: List[List[float]],
+        vectors: np.ndarray,
         ids: List[str],
-        metadata: List[Dict[str, Any]]
+        metadata: List[Dict[str, Any]],
+        wait: bool = False
     ) -> None:
-        """Upsert vectors with metadata."""
+        """Upsert vectors (shape (N, dim)) with metadata; wait=True returns once the write is applied."""
         pass
 
 
@@ -29,78 +39,184 @@ class VectorStore(ABC):
     @abstractmethod
     async def search(
             self,
-            vector: List[float],
+            vector: np.ndarray,
             top_k: int = 5,
-            filter: Optional[Dict[str, Any]] = None
+            filter: Optional[Dict[str, Any]] = None,
+            hydrate: bool = True,
+            score_threshold: Optional[float] = None
         ) -> List[Dict[str, Any]]:
-            """Search for similar vectors."""
+            """
+            Search for similar vectors.
+            
+            With hydrate=False only ids and scores are returned. Results scoring
+            below score_threshold are dropped by the store.
+            """
             pass
     
+    @abstractmethod
+    async def get_payloads(self, ids: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """Fetch stored payloads by point id, keyed by str(id); unknown ids are omitted."""
+        pass
+    
     @abstractmethod
     async def delete_by_document_id(self, document_id: str) -> None:
         """Delete all vectors for a document."""
         pass
 
 class QdrantStore(VectorStore):
-    """Qdrant vector store implementation."""
+    """
+    Qdrant vector store implementation.
+    
+    index_strategy selects how vectors are stored in the HNSW index:
+    - "flat": full float32 vectors, best recall, ~4 bytes per dimension.
+    - "sq8": int8 scalar quantization, ~4x less memory, recall loss
+      usually well under 1% with rescoring.
+    - "pq": product quantization (x16), the smallest index, suited to
+      millions of vectors; lower recall, offset by rescoring on the
+      original vectors at some QPS cost.
+    """
+    
+    INDEX_STRATEGIES = ("flat", "sq8", "pq")
+    
+    # Payload fields with a keyword index, used for filtered search and deletes
+    INDEXED_PAYLOAD_FIELDS = ["document_id", "file_type"]
+    
+    # Payload fields returned by search; other payload keys stay on the server
+    SEARCH_PAYLOAD_FIELDS = ["chunk_text", "chunk_preview", "filename", "chunk_index", "document_id"]
     
-    def __init__(self, url: str, api_key: str, collection_name: str = "documents"):
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        collection_name: str = "documents",
+        upsert_batch_size: int = 256,
+        upsert_concurrency: int = 4,
+        index_strategy: str = "sq8",
+        hnsw_config: Optional[Any] = None,
+        quantization_config: Optional[Any] = None,
+        search_hnsw_ef: int = 128
+    ):
         self.url = url
         self.api_key = api_key
         self.collection_name = collection_name
-        self.client = QdrantClient(url=self.url)
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_concurrency = upsert_concurrency
+        if index_strategy not in self.INDEX_STRATEGIES:
+            raise ValueError(f"Unsupported vector index strategy: {index_strategy}")
+        self.index_strategy = index_strategy
+        self.hnsw_config = hnsw_config
+        self.quantization_config = quantization_config
+        self.search_hnsw_ef = search_hnsw_ef
+        self.client: Optional[AsyncQdrantClient] = None
         self.settings = Settings()
     
     async def initialize(self) -> None:
-        """Initialize Qdrant connection."""
-        from qdrant_client import QdrantClient
-        from qdrant_client.models import Distance, VectorParams
+        """Initialize Qdrant connection. Safe to call more than once."""
+        if self.client is not None:
+            return
+        
+        if self.hnsw_config is None:
+            self.hnsw_config = HnswConfigDiff(m=32, ef_construct=200)
+        if self.quantization_config is None:
+            self.quantization_config = self._quantization_for_strategy()
         
         if self.api_key:
-            self.client = QdrantClient(url=self.url, api_key=self.api_key)
+            self.client = AsyncQdrantClient(url=self.url, api_key=self.api_key)
         else:
-            self.client = QdrantClient(url=self.url)
+            self.client = AsyncQdrantClient(url=self.url)
         
         # Create collection if not exists
         try:
-            self.client.get_collection(self.collection_name)
+            await self.client.get_collection(self.collection_name)
         except Exception:
-            self.client.create_collection(
+            await self.client.create_collection(
                 collection_name=self.collection_name,
                 vectors_config=VectorParams(
                     size=self.settings.embedding_dimension,
-                    distance=Distance.COSINE
+                    distance=Distance.COSINE,
+                    hnsw_config=self.hnsw_config,
+                    quantization_config=self.quantization_config
                 )
             )
+        
+        for field_name in self.INDEXED_PAYLOAD_FIELDS:
+            await self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD
+            )
+    
+    def _quantization_for_strategy(self) -> Optional[Any]:
+        """Build the quantization config for the configured index strategy."""
+        if self.index_strategy == "sq8":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True)
+            )
+        if self.index_strategy == "pq":
+            return ProductQuantization(
+                product=ProductQuantizationConfig(
+                    compression=CompressionRatio.X16,
+                    always_ram=True
+                )
+            )
+        return None
     
     async def upsert_vectors(
         self,
-        vectors: List[List[float]],
+        vectors: np.ndarray,
         ids: List[str],
-        metadata: List[Dict[str, Any]]
+        metadata: List[Dict[str, Any]],
+        wait: bool = False
     ) -> None:
-        """Upsert vectors to Qdrant."""
-        from qdrant_client.models import PointStruct
+        """
+        Upsert vectors to Qdrant.
         
-        points = [
-            PointStruct(
-                id=ids[i],
-                vector=vectors[i],
-                payload=metadata[i]
-            )
-            for i in range(len(vectors))
-        ]
+        By default the server acknowledges batches before applying them; pass
+        wait=True when the caller must know the points are searchable.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        semaphore = asyncio.Semaphore(self.upsert_concurrency)
+        
+        async def upsert_batch(start: int) -> None:
+            end = min(start + self.upsert_batch_size, len(vectors))
+            # The client expects plain lists; convert one batch at a time
+            batch_vectors = vectors[start:end].tolist()
+            points = [
+                PointStruct(
+                    id=ids[i],
+                    vector=batch_vectors[i - start],
+                    payload=metadata[i]
+                )
+                for i in range(start, end)
+            ]
+            async with semaphore:
+                await self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=points,
+                    wait=wait
+                )
+        
+        await asyncio.gather(*(
+            upsert_batch(start)
+            for start in range(0, len(vectors), self.upsert_batch_size)
+        ))
+    
+    async def get_payloads(self, ids: List[Any]) -> Dict[str, Dict[str, Any]]:
+        """Fetch the search payload fields for the given point ids."""
+        if not ids:
+            return {}
         
-        self.client.upsert(
+        points = await self.client.retrieve(
             collection_name=self.collection_name,
-            points=points
+            ids=ids,
+            with_payload=self.SEARCH_PAYLOAD_FIELDS,
+            with_vectors=False
         )
+        return {str(point.id): point.payload for point in points}
     
     async def delete_by_document_id(self, document_id: str) -> None:
         """Delete vectors by document_id."""
-        from qdrant_client.models import Filter, FieldCondition, MatchValue
-        
-        self.client.delete(
+        await self.client.delete(
             collection_name=self.collection_name,
             points_selector=Filter(
                 must=[
@@ -115,13 +231,19 @@ class QdrantStore(VectorStore):
 ###############
     async def search(
         self,
-        vector: List[float],
+        vector: np.ndarray,
         top_k: int = 5,
-        filter: Optional[Dict[str, Any]] = None
+        filter: Optional[Dict[str, Any]] = None,
+        hydrate: bool = True,
+        score_threshold: Optional[float] = None
     ) -> List[Dict[str, Any]]:
-        """Search Qdrant for similar vectors."""
-        from qdrant_client.models import Filter, FieldCondition, MatchValue
+        """
+        Search Qdrant for similar vectors.
         
+        With hydrate=False no payload or vectors are transferred and each
+        result is just {"id", "score"}; callers join chunk data themselves.
+        score_threshold is applied server-side, before payloads are loaded.
+        """
         search_filter = None
         if filter:
             conditions = [
@@ -130,20 +252,33 @@ class QdrantStore(VectorStore):
             ]
             search_filter = Filter(must=conditions)
         
-        results = self.client.search(
+        response = await self.client.query_points(
             collection_name=self.collection_name,
-            query_vector=vector,
+            query=np.asarray(vector, dtype=np.float32).tolist(),
             limit=top_k,
-            query_filter=search_filter
+            query_filter=search_filter,
+            score_threshold=score_threshold,
+            with_payload=self.SEARCH_PAYLOAD_FIELDS if hydrate else False,
+            with_vectors=False,
+            search_params=SearchParams(
+                hnsw_ef=self.search_hnsw_ef,
+                quantization=QuantizationSearchParams(rescore=True)
+            )
         )
         
+        if not hydrate:
+            return [
+                {"id": result.id, "score": result.score}
+                for result in response.points
+            ]
+        
         return [
             {
                 "id": result.id,
                 "score": result.score,
                 "metadata": result.payload
             }
-            for result in results
+            for result in response.points
         ]
 def create_vector_store() -> VectorStore:
     """Factory function to create vector store based on configuration."""
@@ -151,7 +286,13 @@ def create_vector_store() -> VectorStore:
     if settings.vector_db_type == "qdrant":
         return QdrantStore(
             url=settings.qdrant_url,
-            api_key=settings.qdrant_api_key
+            api_key=settings.qdrant_api_key,
+            index_strategy=settings.vector_index_strategy,
+            hnsw_config=HnswConfigDiff(
+                m=settings.qdrant_hnsw_m,
+                ef_construct=settings.qdrant_hnsw_ef_construct
+            ),
+            search_hnsw_ef=settings.qdrant_search_hnsw_ef
         )
     # Add Weaviate and Milvus implementations similarly
     else:
@@ -1,8 +1,9 @@
 from config.settings import Settings
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any
 from dotenv import load_dotenv
+from openai import AsyncOpenAI
 
 load_dotenv() # Load environment variables from .env file
 
@@ -20,13 +21,25 @@ class LLMService(ABC):
     ) -> str:
         """Generate response from LLM."""
         pass
+    
+    async def generate_response_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1000
+    ) -> AsyncIterator[str]:
+        """Stream response tokens; providers without streaming yield one chunk."""
+        yield await self.generate_response(
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
 
 
 class OpenAIService(LLMService):
     """OpenAI GPT service."""
     
     def __init__(self, api_key: str, model: str = "gpt-4-turbo-preview"):
-        from openai import AsyncOpenAI
         self.client = AsyncOpenAI(api_key=api_key)
         self.model = model
     
@@ -44,6 +57,24 @@ class OpenAIService(LLMService):
             max_tokens=max_tokens
         )
         return response.choices[0].message.content
+    
+    async def generate_response_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        max_tokens: int = 1000
+    ) -> AsyncIterator[str]:
+        """Stream response tokens using OpenAI."""
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
 def create_llm_service() -> LLMService:
     """Factory function to create LLM service."""
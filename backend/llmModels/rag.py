@@ -1,14 +1,61 @@
 from typing import Any, Dict, Optional
 from backend.db.chatMemory import RedisMemoryManager
+from backend.db.database import DatabaseManager
 from backend.db.vector import VectorStore
 from backend.llmModels.llm import LLMService
 from backend.services.embedding import EmbeddingService
 from config.settings import Settings 
-from typing import List, Dict, Tuple
+from typing import AsyncIterator, List, Dict, Set, Tuple
+from collections import OrderedDict
+from cachetools import TTLCache
+from hashlib import blake2b, sha256
+import numpy as np
+import orjson
+import asyncio
 import logging
+import re
+import textwrap
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of built context strings kept per service
+CONTEXT_CACHE_SIZE = 256
+
+# System prompts, built once; dedent keeps source indentation out of the prompt
+_SYS_PROMPT_WITH_CTX = textwrap.dedent("""\
+    You are a helpful AI assistant. Use the following context from documents to answer the user's question. If the context doesn't contain relevant information, say so and provide a helpful response based on your general knowledge.
+
+    Context from documents:
+    {context}
+
+    Guidelines:
+    - Answer based on the context when possible
+    - Be concise and accurate
+    - If booking an interview, guide the user through the process
+    - Be conversational and friendly""")
+
+_SYS_PROMPT_NO_CTX = (
+    "You are a helpful AI assistant. The knowledge base doesn't contain information "
+    "relevant to this query. Provide a helpful response based on your general knowledge, "
+    "or guide the user to ask questions related to the available documents."
+)
+
+_SYS_PROMPT_NO_RAG = (
+    "You are a helpful AI assistant. Answer the user's questions in a friendly "
+    "and informative manner."
+)
+
+# Short-lived session_id -> (query, use_rag, response, sources) cache of each
+# session's last answer, for duplicate retries
+RECENT_RESPONSE_CACHE_SIZE = 1024
+RECENT_RESPONSE_TTL_SECONDS = 30
+
+# Booking intent keywords, matched as substrings in a single pass
+_BOOKING_RE = re.compile(
+    r"book|schedule|appointment|interview|meeting|reserve|set up|arrange",
+    re.IGNORECASE
+)
+
 
 class CustomRAGService:
     """Custom Retrieval-Augmented Generation service."""
@@ -22,7 +69,8 @@ class CustomRAGService:
         settings: Settings = Settings(),
         top_k: int = 5,
         similarity_threshold: float = 0.7,
-        max_context_length: int = 3000
+        max_context_length: int = 3000,
+        db_manager: Optional[DatabaseManager] = None
     ):
         self.vector_store = vector_store
         self.embedding_service = embedding_service
@@ -32,6 +80,20 @@ class CustomRAGService:
         self.top_k = top_k
         self.similarity_threshold = similarity_threshold
         self.max_context_length = max_context_length
+        self.db_manager = db_manager
+        self._context_cache: "OrderedDict[Tuple[str, ...], str]" = OrderedDict()
+        self._background_tasks: Set[asyncio.Task] = set()
+        self._llm_semaphore = asyncio.Semaphore(settings.llm_max_concurrency)
+        self._recent_responses: TTLCache = TTLCache(
+            maxsize=RECENT_RESPONSE_CACHE_SIZE,
+            ttl=RECENT_RESPONSE_TTL_SECONDS
+        )
+        # session_id -> (query, use_rag, future) for the answer being generated
+        self._inflight: Dict[str, Tuple[str, bool, asyncio.Future]] = {}
+    
+    async def warmup(self) -> None:
+        """Touch the embedding model so the first request does not pay its startup cost."""
+        await self.embedding_service.generate_embeddings(["warmup"])
     
     async def retrieve_relevant_chunks(
         self,
@@ -39,134 +101,424 @@ class CustomRAGService:
     ) -> List[Dict[str, Any]]:
         """Retrieve relevant document chunks for query."""
         # Generate query embedding
-        query_embedding = await self.embedding_service.generate_embedding(query)
+        query_embedding = await self._embed_query(query)
+        
+        if self.db_manager is not None and self.settings.retrieval_hydrate_from_db:
+            return await self._retrieve_and_hydrate(query_embedding)
         
         # Search vector store
         results = await self.vector_store.search(
             vector=query_embedding,
             top_k=self.top_k,
-            filter=None
+            filter=None,
+            score_threshold=self.similarity_threshold
         )
         
-        # Filter by similarity threshold
         relevant_chunks = [
             {
                 "chunk_id": result["id"],
                 "text": result["metadata"]["chunk_text"],
+                "preview": result["metadata"].get("chunk_preview"),
                 "score": result["score"],
                 "document_id": result["metadata"]["document_id"],
                 "filename": result["metadata"]["filename"]
             }
             for result in results
-            if result["score"] >= self.similarity_threshold
         ]
         
         logger.info(f"Retrieved {len(relevant_chunks)} relevant chunks")
         return relevant_chunks
     
+    async def _retrieve_and_hydrate(
+        self,
+        query_embedding: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """Search for ids and scores only, then load chunk text from the database."""
+        results = await self.vector_store.search(
+            vector=query_embedding,
+            top_k=self.top_k,
+            filter=None,
+            hydrate=False,
+            score_threshold=self.similarity_threshold
+        )
+        
+        rows = await self.db_manager.get_chunks_by_ids(
+            [str(result["id"]) for result in results]
+        )
+        
+        # Chunks ingested before chunk rows were keyed by point id have no
+        # matching row; fall back to the vector payload for those
+        missing_ids = [
+            result["id"] for result in results if str(result["id"]) not in rows
+        ]
+        payloads: Dict[str, Dict[str, Any]] = {}
+        if missing_ids:
+            logger.warning(
+                f"{len(missing_ids)} of {len(results)} retrieved chunks have no "
+                f"database row; loading them from the vector store payload"
+            )
+            payloads = await self.vector_store.get_payloads(missing_ids)
+        
+        relevant_chunks = []
+        for result in results:
+            row = rows.get(str(result["id"]))
+            if row is None:
+                row = payloads.get(str(result["id"]))
+                if row is None:
+                    continue
+            relevant_chunks.append({
+                "chunk_id": result["id"],
+                "text": row["chunk_text"],
+                "score": result["score"],
+                "document_id": row["document_id"],
+                "filename": row["filename"]
+            })
+        
+        logger.info(f"Retrieved {len(relevant_chunks)} relevant chunks")
+        return relevant_chunks
+    
     def _build_context(self, chunks: List[Dict[str, Any]]) -> str:
-        """Build context string from retrieved chunks."""
+        """
+        Build context string from retrieved chunks.
+        
+        The length budget covers the full formatted output (source headers
+        and separators included). Results are memoized by chunk ID sequence.
+        """
         if not chunks:
             return ""
         
+        cache_key = tuple(chunk["chunk_id"] for chunk in chunks)
+        cached = self._context_cache.get(cache_key)
+        if cached is not None:
+            self._context_cache.move_to_end(cache_key)
+            return cached
+        
         context_parts = []
         total_length = 0
         
         for i, chunk in enumerate(chunks, 1):
-            chunk_text = chunk["text"]
+            block = f"[Source {i} - {chunk['filename']}]\n{chunk['text']}"
+            # Account for the "\n\n" separator before every block but the first
+            block_length = len(block) + (2 if context_parts else 0)
             
             # Check if adding this chunk exceeds max context length
-            if total_length + len(chunk_text) > self.max_context_length:
+            if total_length + block_length > self.max_context_length:
                 break
             
-            context_parts.append(
-                f"[Source {i} - {chunk['filename']}]\n{chunk_text}"
-            )
-            total_length += len(chunk_text)
+            context_parts.append(block)
+            total_length += block_length
         
-        return "\n\n".join(context_parts)
+        context = "\n\n".join(context_parts)
+        
+        self._context_cache[cache_key] = context
+        if len(self._context_cache) > CONTEXT_CACHE_SIZE:
+            self._context_cache.popitem(last=False)
+        return context
     
     async def generate_response(
         self,
         session_id: str,
         query: str,
-        use_rag: bool = True
+        use_rag: bool = True,
+        use_cache: bool = True
     ) -> Tuple[str, List[Dict[str, Any]]]:
         """
         Generate response using RAG.
         
+        Thin wrapper that drains generate_response_stream.
+        
         Returns:
             Tuple of (response_text, source_chunks)
         """
-        sources = []
+        tokens, sources = await self.generate_response_stream(
+            session_id=session_id,
+            query=query,
+            use_rag=use_rag,
+            use_cache=use_cache
+        )
+        response = "".join([token async for token in tokens])
+        return response, sources
+    
+    async def generate_response_stream(
+        self,
+        session_id: str,
+        query: str,
+        use_rag: bool = True,
+        use_cache: bool = True
+    ) -> Tuple[AsyncIterator[str], List[Dict[str, Any]]]:
+        """
+        Retrieve context and start a streamed RAG response.
+        
+        Responses are cached in Redis keyed by the model and the full message
+        list (retrieved context, conversation history and query). The cache is
+        only consulted when generation is deterministic (temperature 0) and
+        use_cache is set. A retry of the session's last query within
+        RECENT_RESPONSE_TTL_SECONDS replays that answer and its sources, and a
+        retry arriving while the original is still generating waits for it;
+        neither runs retrieval or writes memory again.
+        Once the stream is exhausted the cache entry and the exchange are written
+        in background tasks, so callers do not wait on Redis. Concurrent LLM
+        calls are capped at settings.llm_max_concurrency; a slot is held only
+        while the provider streams, not while the client reads. The returned
+        iterator must be consumed.
+        
+        Returns:
+            Tuple of (token_iterator, source_chunks)
+        """
+        if use_cache:
+            duplicate = await self._find_duplicate(session_id, query, use_rag)
+            if duplicate is not None:
+                duplicate_response, duplicate_sources = duplicate
+                
+                async def replay() -> AsyncIterator[str]:
+                    yield duplicate_response
+                
+                return replay(), duplicate_sources
         
-        # Retrieve conversation history
-        conversation_history = await self.memory_manager.get_context_window(
+        # This query is now the session's latest; register it for coalescing
+        self._recent_responses.pop(session_id, None)
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[session_id] = (query, use_rag, future)
+        
+        try:
+            messages, sources = await self._build_messages(session_id, query, use_rag)
+            
+            cache_key = None
+            if use_cache and self.settings.llm_temperature == 0:
+                cache_key = self._response_cache_key(messages, self.settings.llm_model)
+            
+            cached = await self._get_cached_response(cache_key)
+        except BaseException:
+            self._finish_inflight(session_id, future, None)
+            raise
+        
+        async def tokens() -> AsyncIterator[str]:
+            result = None
+            try:
+                if cached is not None:
+                    yield cached
+                    response = cached
+                else:
+                    parts: List[str] = []
+                    # The provider stream is drained by a separate task so a slow
+                    # client does not hold an LLM slot while it reads
+                    queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+                    producer = asyncio.create_task(self._produce_tokens(messages, queue))
+                    try:
+                        while (token := await queue.get()) is not None:
+                            parts.append(token)
+                            yield token
+                        # Re-raise any provider error
+                        await producer
+                    finally:
+                        producer.cancel()
+                    
+                    response = "".join(parts)
+                    self._cache_response_later(cache_key, response)
+                
+                result = (response, sources)
+                self._recent_responses[session_id] = (query, use_rag, response, sources)
+                self._persist_exchange(session_id, query, response)
+            finally:
+                self._finish_inflight(session_id, future, result)
+        
+        return tokens(), sources
+    
+    async def _build_messages(
+        self,
+        session_id: str,
+        query: str,
+        use_rag: bool
+    ) -> Tuple[List[Dict[str, str]], List[Dict[str, Any]]]:
+        """Fetch history and context and build the LLM messages; returns (messages, sources)."""
+        # Retrieve conversation history and relevant chunks concurrently
+        history_task = self.memory_manager.get_context_window(
             session_id,
             max_messages=6  # Last 3 exchanges
         )
-        
-        # Build messages for LLM
-        messages = []
+        if use_rag:
+            conversation_history, sources = await asyncio.gather(
+                history_task,
+                self.retrieve_relevant_chunks(query)
+            )
+        else:
+            conversation_history, sources = await history_task, []
         
         if use_rag:
-            # Retrieve relevant chunks
-            sources = await self.retrieve_relevant_chunks(query)
-            
             if sources:
                 # Build context from retrieved chunks
                 context = self._build_context(sources)
                 
                 # System prompt with context
-                system_prompt = f"""You are a helpful AI assistant. Use the following context from documents to answer the user's question. If the context doesn't contain relevant information, say so and provide a helpful response based on your general knowledge.
-
-                Context from documents:
-                {context}
-
-                Guidelines:
-                - Answer based on the context when possible
-                - Be concise and accurate
-                - If booking an interview, guide the user through the process
-                - Be conversational and friendly
-                """
+                system_prompt = _SYS_PROMPT_WITH_CTX.format(context=context)
             else:
                 # No relevant context found
-                system_prompt = """You are a helpful AI assistant. The knowledge base doesn't contain information relevant to this query. Provide a helpful response based on your general knowledge, or guide the user to ask questions related to the available documents."""
+                system_prompt = _SYS_PROMPT_NO_CTX
         else:
             # No RAG, just conversational
-            system_prompt = """You are a helpful AI assistant. Answer the user's questions in a friendly and informative manner."""
-        
-        messages.append({"role": "system", "content": system_prompt})
+            system_prompt = _SYS_PROMPT_NO_RAG
         
-        # Add conversation history if exists
+        # Build messages for LLM: one system message carrying prompt and history
+        system_parts = [system_prompt]
         if conversation_history:
-            messages.append({
-                "role": "system",
-                "content": f"Previous conversation:\n{conversation_history}"
-            })
+            system_parts.append("\n\nPrevious conversation:\n")
+            system_parts.append(conversation_history)
+        
+        messages = [
+            {"role": "system", "content": "".join(system_parts)},
+            {"role": "user", "content": query}
+        ]
+        return messages, sources
+    
+    async def _find_duplicate(
+        self,
+        session_id: str,
+        query: str,
+        use_rag: bool
+    ) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """Return (response, sources) if query repeats the session's last or in-flight query."""
+        recent = self._recent_responses.get(session_id)
+        if recent is not None and recent[:2] == (query, use_rag):
+            return recent[2], recent[3]
         
-        # Add current query
-        messages.append({"role": "user", "content": query})
+        inflight = self._inflight.get(session_id)
+        if inflight is not None and inflight[:2] == (query, use_rag):
+            # Resolves to None if the original fails; the caller then generates
+            return await asyncio.shield(inflight[2])
+        return None
+    
+    def _finish_inflight(
+        self,
+        session_id: str,
+        future: asyncio.Future,
+        result: Optional[Tuple[str, List[Dict[str, Any]]]]
+    ) -> None:
+        """Release waiters coalesced onto future and unregister it."""
+        inflight = self._inflight.get(session_id)
+        if inflight is not None and inflight[2] is future:
+            del self._inflight[session_id]
+        if not future.done():
+            future.set_result(result)
+    
+    async def _produce_tokens(
+        self,
+        messages: List[Dict[str, str]],
+        queue: "asyncio.Queue[Optional[str]]"
+    ) -> None:
+        """Feed LLM tokens into queue, then None; holds an LLM slot only for the provider call."""
+        try:
+            # Bound in-flight LLM calls to avoid provider rate-limit backoff
+            async with self._llm_semaphore:
+                async for token in self.llm_service.generate_response_stream(
+                    messages=messages,
+                    temperature=self.settings.llm_temperature,
+                    max_tokens=self.settings.max_tokens
+                ):
+                    queue.put_nowait(token)
+        finally:
+            queue.put_nowait(None)
+    
+    def _persist_exchange(self, session_id: str, query: str, response: str) -> None:
+        """Store the user/assistant exchange in memory without blocking the caller."""
+        task = asyncio.create_task(self.memory_manager.add_messages(session_id, [
+            {"role": "user", "content": query},
+            {"role": "assistant", "content": response}
+        ]))
+        # Keep a reference until done so the task is not garbage collected
+        self._background_tasks.add(task)
+        task.add_done_callback(self._on_persist_done)
+    
+    def _cache_response_later(self, cache_key: Optional[str], response: str) -> None:
+        """Write the response to the LLM cache without holding the stream open."""
+        if cache_key is None:
+            return
+        task = asyncio.create_task(self._set_cached_response(cache_key, response))
+        # _set_cached_response logs its own failures
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    def _on_persist_done(self, task: asyncio.Task) -> None:
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Failed to store conversation: {str(task.exception())}")
+    
+    async def _embed_query(self, query: str) -> np.ndarray:
+        """
+        Embed the query, checking the in-process LRU first and then a float32
+        vector cached in Redis. Both caches key on the normalized query text.
+        """
+        normalized = self.embedding_service.normalize_query(query)
+        embedding = self.embedding_service.get_cached_embedding(normalized)
+        if embedding is not None:
+            return embedding
         
-        # Generate response
-        response = await self.llm_service.generate_response(
-            messages=messages,
-            temperature=self.settings.llm_temperature,
-            max_tokens=self.settings.max_tokens
+        cache_key = (
+            f"emb:{self.settings.embedding_model}:"
+            f"{sha256(normalized.encode()).hexdigest()}"
         )
         
-        # Store in memory
-        await self.memory_manager.add_message(session_id, "user", query)
-        await self.memory_manager.add_message(session_id, "assistant", response)
+        try:
+            cached = await self.memory_manager.client.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {str(e)}")
+            cached = None
         
-        return response, sources
+        if cached is not None:
+            embedding = np.frombuffer(cached, dtype=np.float32)
+            self.embedding_service.cache_embedding(normalized, embedding)
+            return embedding
+        
+        embedding = await self.embedding_service.generate_embedding(normalized)
+        
+        try:
+            await self.memory_manager.client.set(
+                cache_key,
+                np.asarray(embedding, dtype=np.float32).tobytes(),
+                ex=self.settings.embedding_cache_ttl
+            )
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {str(e)}")
+        
+        return embedding
+    
+    @staticmethod
+    def _response_cache_key(messages: List[Dict[str, str]], model: str) -> str:
+        """Build the Redis key for a cached LLM response from the exact prompt and model."""
+        digest = blake2b(
+            model.encode() + b"|" + orjson.dumps(messages),
+            digest_size=16
+        ).hexdigest()
+        return f"llm:{digest}"
+    
+    async def _get_cached_response(self, cache_key: Optional[str]) -> Optional[str]:
+        """Return a cached LLM response, or None on miss or when caching is bypassed."""
+        if cache_key is None:
+            return None
+        
+        try:
+            cached = await self.memory_manager.client.get(cache_key)
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {str(e)}")
+            return None
+        
+        if cached is None:
+            return None
+        return orjson.loads(cached)["text"]
+    
+    async def _set_cached_response(self, cache_key: Optional[str], response: str) -> None:
+        """Store an LLM response in the cache."""
+        if cache_key is None:
+            return
+        
+        try:
+            await self.memory_manager.client.set(
+                cache_key,
+                orjson.dumps({"text": response}),
+                ex=self.settings.llm_cache_ttl
+            )
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {str(e)}")
     
     async def detect_booking_intent(self, query: str) -> bool:
         """Detect if user wants to book an interview."""
-        booking_keywords = [
-            "book", "schedule", "appointment", "interview",
-            "meeting", "reserve", "set up", "arrange"
-        ]
-        
-        query_lower = query.lower()
-        return any(keyword in query_lower for keyword in booking_keywords)
+        return _BOOKING_RE.search(query) is not None
@@ -1,4 +1,6 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from contextlib import asynccontextmanager
 from pathlib import Path
 from datetime import datetime
 
@@ -7,18 +9,52 @@ import sys
 sys.path.append(str(Path(__file__).parent.parent))
 
 
-from backend.services.services import memory_manager, vector_store, embedding_service, llm_service, rag_service, db_manager, settings 
-from backend.llmModels.rag import CustomRAGService
+from backend.services.services import get_memory_manager, get_vector_store, get_db_manager, get_process_executor, get_rag_service
 
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize all services on startup and clean up on shutdown."""
+    logger.info("Initializing services...")
+    await get_db_manager().initialize()
+    await get_vector_store().initialize()
+
+    memory_manager = get_memory_manager()
+    await memory_manager.initialize()
+    logger.info("All services initialized successfully")
+
+    # Test Redis connection immediately
+    try:
+        pong = await memory_manager.client.ping()
+        if pong:
+            logger.info("Redis client initialized successfully")
+        else:
+            logger.warning("Redis client ping returned False")
+    except Exception as e:
+        logger.error(f"Redis client failed to initialize: {str(e)}")
+        raise RuntimeError("Redis initialization failed") from e
+    
+    # Run one encode so the first user query does not pay model warm-up
+    await get_rag_service().warmup()
+
+    yield
+
+    logger.info("Shutting down services...")
+    await memory_manager.close()
+    get_process_executor().shutdown(wait=False, cancel_futures=True)
+    logger.info("Services shut down successfully")
+
+
 app = FastAPI(
     title="RAG Backend API",
     description="Document Ingestion and Conversational RAG with Interview Booking",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 @app.get("/")
@@ -38,47 +74,6 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize all services on startup."""
-    logger.info("Initializing services...")
-    await db_manager.initialize()
-    await vector_store.initialize()
-    # gloabalize rag_service
-    global rag_service
-
-    await memory_manager.initialize()
-    logger.info("All services initialized successfully")
-
-        # Test Redis connection immediately
-    try:
-        pong = await memory_manager.client.ping()
-        if pong:
-            logger.info("Redis client initialized successfully")
-        else:
-            logger.warning("Redis client ping returned False")
-    except Exception as e:
-        logger.error(f"Redis client failed to initialize: {str(e)}")
-        raise RuntimeError("Redis initialization failed") from e
-    
-    rag_service = CustomRAGService(
-        vector_store=vector_store,
-        embedding_service=embedding_service,
-        llm_service=llm_service,
-        memory_manager=memory_manager,
-        top_k=settings.retrieval_top_k,
-        similarity_threshold=settings.similarity_threshold,
-        max_context_length=settings.max_context_length
-    )
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup on shutdown."""
-    logger.info("Shutting down services...")
-    await memory_manager.close()
-    logger.info("Services shut down successfully")
-
 
 # Include routers
 from backend.api.v1 import ingestion, chat
@@ -1,13 +1,17 @@
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional, Literal
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import partial
+
+# Timezone-aware replacement for the deprecated datetime.utcnow
+_utcnow = partial(datetime.now, timezone.utc)
 
 
 class ChatMessage(BaseModel):
     """Single chat message."""
     role: Literal["user", "assistant", "system"]
     content: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=_utcnow)
 
 
 class ChatRequest(BaseModel):
@@ -26,6 +30,10 @@ class ChatRequest(BaseModel):
         default=True,
         description="Whether to use RAG for this query"
     )
+    use_cache: bool = Field(
+        default=True,
+        description="Whether a cached response may be returned for this query"
+    )
 
 
 class ChatResponse(BaseModel):
@@ -36,7 +44,7 @@ class ChatResponse(BaseModel):
         default_factory=list,
         description="Retrieved document chunks used for response"
     )
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=_utcnow)
 
 class ChatHistoryResponse(BaseModel):
     """Response schema for chat history endpoint."""
@@ -75,5 +83,5 @@ class BookingResponse(BaseModel):
     preferred_date: str
     preferred_time: str
     status: str = "pending"
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=_utcnow)
     message: str
\ No newline at end of file
@@ -37,6 +37,20 @@ class ChunkMetadata(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class EmbeddingBatch(Base):
+    """SQLAlchemy model for deferred (background) embedding jobs."""
+    
+    __tablename__ = "embedding_batches"
+    
+    id = Column(String, primary_key=True, index=True)
+    document_id = Column(String, nullable=False, index=True)
+    status = Column(String, nullable=False, default="pending")
+    total_chunks = Column(Integer, nullable=False)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+
 # Pydantic Schemas
 class DocumentUploadResponse(BaseModel):
     """Response schema for document upload."""
@@ -49,6 +63,22 @@ class DocumentUploadResponse(BaseModel):
     total_chunks: int
     upload_timestamp: datetime
     message: str
+    batch_id: Optional[str] = Field(
+        default=None,
+        description="Embedding batch ID when embeddings are generated in the background"
+    )
+
+
+class EmbeddingBatchResponse(BaseModel):
+    """Response schema for embedding batch status."""
+    
+    batch_id: str
+    document_id: str
+    status: str
+    total_chunks: int
+    error: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
 
 
 class ChunkingStrategy(BaseModel):
@@ -1,29 +1,103 @@
 from sentence_transformers import SentenceTransformer
-from typing import List
+from collections import OrderedDict
+import asyncio
+from typing import List, Optional
+import numpy as np
 
 class EmbeddingService:
     """Service for generating embeddings using sentence transformers."""
     
-    def __init__(self, model_name: str):
-        self.model = SentenceTransformer(model_name)
+    def __init__(
+        self,
+        model_name: str,
+        query_cache_size: int = 4096,
+        backend: str = "torch",
+        model_file: Optional[str] = None
+    ):
+        """
+        backend="onnx" runs the model through ONNX Runtime; combine it with
+        model_file (e.g. "onnx/model_qint8_avx512_vnni.onnx") to load a
+        dynamically int8-quantized export. Requires optimum[onnxruntime].
+        """
+        model_kwargs = {"file_name": model_file} if model_file else None
+        self.model = SentenceTransformer(
+            model_name,
+            backend=backend,
+            model_kwargs=model_kwargs
+        )
+        if backend == "torch" and self.model.device.type == "cuda":
+            # Half precision roughly doubles GPU encode throughput; outputs
+            # are cast back to float32
+            self.model.half()
+        self.model_name = model_name
         self.dimension = self.model.get_sentence_embedding_dimension()
+        # Unit-length vectors make cosine similarity a plain dot product
+        self.normalize = True
+        # Per-instance LRU of query embeddings, keyed by normalized text
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_cache_size = query_cache_size
     
-    async def generate_embeddings(
+    @staticmethod
+    def normalize_query(text: str) -> str:
+        """Lowercase and collapse whitespace so equivalent queries share a cache entry."""
+        return " ".join(text.lower().split())
+    
+    def get_cached_embedding(self, normalized_text: str) -> Optional[np.ndarray]:
+        """Return the locally cached embedding for a normalized query, or None."""
+        embedding = self._query_cache.get(normalized_text)
+        if embedding is not None:
+            self._query_cache.move_to_end(normalized_text)
+        return embedding
+    
+    def cache_embedding(self, normalized_text: str, embedding: np.ndarray) -> None:
+        """Store a query embedding in the local LRU."""
+        # Cached arrays are shared between callers
+        embedding.flags.writeable = False
+        self._query_cache[normalized_text] = embedding
+        self._query_cache.move_to_end(normalized_text)
+        if len(self._query_cache) > self._query_cache_size:
+            self._query_cache.popitem(last=False)
+    
+    def _encode_uncached(self, text: str) -> np.ndarray:
+        """Encode a single text without consulting the cache (blocking)."""
+        embedding = self.model.encode(
+            [text],
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize
+        )[0]
+        # The model may run in float16 on CUDA; callers expect float32
+        return embedding.astype(np.float32, copy=False)
+    
+    async def generate_embeddings_batched(
         self,
         texts: List[str],
-        batch_size: int = 32
-    ) -> List[List[float]]:
-        """Generate embeddings for a list of texts."""
-        embeddings = self.model.encode(
+        batch_size: int = 64
+    ) -> np.ndarray:
+        """Generate embeddings for many texts in a single encode call, off the event loop."""
+        embeddings = await asyncio.to_thread(
+            self.model.encode,
             texts,
             batch_size=batch_size,
             show_progress_bar=False,
-            convert_to_numpy=True
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize
         )
-        return embeddings.tolist()
+        return embeddings.astype(np.float32, copy=False)
     
-    async def generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for a single text."""
-        embeddings = await self.generate_embeddings([text])
-        return embeddings[0]
-
+    async def generate_embeddings(
+        self,
+        texts: List[str],
+        batch_size: int = 32
+    ) -> np.ndarray:
+        """Generate float32 embeddings of shape (N, dim) for a list of texts."""
+        return await self.generate_embeddings_batched(texts, batch_size=batch_size)
+    
+    async def generate_embedding(self, text: str) -> np.ndarray:
+        """Generate a 1-D embedding for a single text, reusing cached query embeddings."""
+        normalized = self.normalize_query(text)
+        embedding = self.get_cached_embedding(normalized)
+        if embedding is None:
+            embedding = await asyncio.to_thread(self._encode_uncached, normalized)
+            self.cache_embedding(normalized, embedding)
+        return embedding
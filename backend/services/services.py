@@ -1,35 +1,127 @@
-from backend.db.vector import create_vector_store
+from backend.db.vector import VectorStore, create_vector_store
 from backend.services.embedding import EmbeddingService
 from backend.db.database import DatabaseManager
 from backend.db.chatMemory import RedisMemoryManager
 from backend.services.text_processing import TextExtractor
-from backend.llmModels.llm import create_llm_service
+from backend.llmModels.llm import LLMService, create_llm_service
 from backend.llmModels.rag import CustomRAGService
 from config.settings import Settings
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import multiprocessing
+import os
 
 settings = Settings()
 
-memory_manager = RedisMemoryManager(
-    host=settings.redis_host,
-    port=settings.redis_port,
-    db=settings.redis_db,
-    password=settings.redis_password,
-    ttl=settings.redis_ttl
-)
-db_manager = DatabaseManager(settings.database_url)
-vector_store = create_vector_store()
-embedding_service = EmbeddingService(settings.embedding_model)
-llm_service = create_llm_service()
-text_extractor = TextExtractor()
-
-        
-rag_service: Optional[CustomRAGService] = CustomRAGService(
-    vector_store=vector_store,
-    embedding_service=embedding_service,
-    llm_service=llm_service,
-    memory_manager=memory_manager,
-    top_k=settings.retrieval_top_k,
-    similarity_threshold=settings.similarity_threshold,
-    max_context_length=settings.max_context_length
-)
\ No newline at end of file
+# Process-wide singletons, each built on first use so importing this module
+# (workers, CLI tools, tests) does not connect to anything or load the model.
+
+
+@lru_cache(maxsize=1)
+def get_memory_manager() -> RedisMemoryManager:
+    """Return the shared Redis memory manager."""
+    return RedisMemoryManager(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        db=settings.redis_db,
+        password=settings.redis_password,
+        ttl=settings.redis_ttl
+    )
+
+
+@lru_cache(maxsize=1)
+def get_db_manager() -> DatabaseManager:
+    """Return the shared database manager."""
+    return DatabaseManager(
+        settings.database_url,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        behind_pgbouncer=settings.db_behind_pgbouncer
+    )
+
+
+@lru_cache(maxsize=1)
+def get_vector_store() -> VectorStore:
+    """Return the shared vector store."""
+    return create_vector_store()
+
+
+@lru_cache(maxsize=1)
+def get_embedding_service() -> EmbeddingService:
+    """Return the shared embedding service (loads the model on first call)."""
+    return EmbeddingService(
+        settings.embedding_model,
+        backend=settings.embedding_backend,
+        model_file=settings.embedding_model_file or None
+    )
+
+
+@lru_cache(maxsize=1)
+def get_llm_service() -> LLMService:
+    """Return the shared LLM service."""
+    return create_llm_service()
+
+
+@lru_cache(maxsize=1)
+def get_text_extractor() -> TextExtractor:
+    """Return the shared text extractor."""
+    return TextExtractor()
+
+
+@lru_cache(maxsize=1)
+def get_process_executor() -> ProcessPoolExecutor:
+    """Return the pool for CPU-bound ingestion work (PDF parsing, chunking)."""
+    # Spawn rather than fork: by the first submit the parent already runs
+    # torch/OpenMP and to_thread workers, and forking a multithreaded process
+    # can deadlock. Workers are capped since each may load its own tokenizer.
+    return ProcessPoolExecutor(
+        max_workers=min(settings.ingestion_max_workers, os.cpu_count() or 1),
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+@lru_cache(maxsize=1)
+def get_rag_service() -> CustomRAGService:
+    """Return the process-wide RAG service, built on first use."""
+    return CustomRAGService(
+        vector_store=get_vector_store(),
+        embedding_service=get_embedding_service(),
+        llm_service=get_llm_service(),
+        memory_manager=get_memory_manager(),
+        top_k=settings.retrieval_top_k,
+        similarity_threshold=settings.similarity_threshold,
+        max_context_length=settings.max_context_length,
+        db_manager=get_db_manager()
+    )
+
+
+# FastAPI runs sync dependencies in the threadpool; these async wrappers let
+# routes inject the singletons without a thread hop per request.
+
+
+async def memory_manager_dep() -> RedisMemoryManager:
+    """Inject the shared Redis memory manager."""
+    return get_memory_manager()
+
+
+async def db_manager_dep() -> DatabaseManager:
+    """Inject the shared database manager."""
+    return get_db_manager()
+
+
+async def vector_store_dep() -> VectorStore:
+    """Inject the shared vector store."""
+    return get_vector_store()
+
+
+async def embedding_service_dep() -> EmbeddingService:
+    """Inject the shared embedding service."""
+    return get_embedding_service()
+
+
+async def rag_service_dep() -> CustomRAGService:
+    """Inject the shared RAG service."""
+    return get_rag_service()
@@ -1,8 +1,13 @@
-from typing import List
-import PyPDF2
-from io import BytesIO
+from functools import lru_cache
+from typing import List, Optional
+import asyncio
+import threading
+import pypdfium2 as pdfium
 from langchain_text_splitters import RecursiveCharacterTextSplitter, SentenceTransformersTokenTextSplitter
 
+# PDFium is not thread-safe; parallelize across processes, serialize within one
+_PDFIUM_LOCK = threading.Lock()
+
 
 class TextExtractor:
     """Extract text from various file formats."""
@@ -10,74 +15,165 @@ class TextExtractor:
         pass
 
     @staticmethod
-    async def extract_from_pdf(file_content: bytes) -> str:
-        """Extract text from PDF file."""
+    def extract_pdf_sync(file_content: bytes) -> str:
+        """Extract text from PDF file (blocking)."""
         try:
-            pdf_file = BytesIO(file_content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            text_parts: List[str] = []
-            for page in pdf_reader.pages:
-                text = page.extract_text()
-                if text:
-                    text_parts.append(text)
+            with _PDFIUM_LOCK:
+                pdf = pdfium.PdfDocument(file_content)
+                try:
+                    text_parts: List[str] = []
+                    for page in pdf:
+                        textpage = page.get_textpage()
+                        try:
+                            text = textpage.get_text_bounded()
+                        finally:
+                            textpage.close()
+                            page.close()
+                        if text:
+                            # PDFium emits CRLF; splitters expect "\n"
+                            text_parts.append(text.replace("\r\n", "\n"))
+                finally:
+                    pdf.close()
             
             return "\n\n".join(text_parts)
         except Exception as e:
             raise ValueError(f"Failed to extract text from PDF: {str(e)}")
     
     @staticmethod
-    async def extract_from_txt(file_content: bytes) -> str:
-        """Extract text from TXT file."""
+    def extract_txt_sync(file_content: bytes) -> str:
+        """Extract text from TXT file (blocking)."""
         try:
             return file_content.decode("utf-8")
         except UnicodeDecodeError:
             # Try with different encoding
             return file_content.decode("latin-1")
+    
+    @staticmethod
+    async def extract_from_pdf(file_content: bytes) -> str:
+        """
+        Extract text from PDF file without blocking the event loop.
+        
+        Calls are serialized by _PDFIUM_LOCK; use a process pool with
+        extract_text_sync for parallel extraction.
+        """
+        return await asyncio.to_thread(TextExtractor.extract_pdf_sync, file_content)
+    
+    @staticmethod
+    async def extract_from_txt(file_content: bytes) -> str:
+        """Extract text from TXT file."""
+        return TextExtractor.extract_txt_sync(file_content)
+
+
+@lru_cache(maxsize=32)
+def _get_fixed_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    """Build (once per size/overlap pair, per process) a fixed-size splitter."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+
+
+@lru_cache(maxsize=8)
+def _get_semantic_splitter(
+    chunk_overlap: int,
+    tokens_per_chunk: int,
+    model_name: Optional[str]
+) -> SentenceTransformersTokenTextSplitter:
+    """
+    Build (once per configuration, per process) a token splitter; this loads a tokenizer model.
+    
+    tokens_per_chunk is clamped to the model's max_seq_length (256 for
+    all-MiniLM-L6-v2), which the splitter would otherwise reject.
+    """
+    kwargs = {"model_name": model_name} if model_name is not None else {}
+    # None sizes chunks to the model limit; shrink afterwards if smaller was asked
+    splitter = SentenceTransformersTokenTextSplitter(
+        chunk_overlap=chunk_overlap,
+        tokens_per_chunk=None,
+        **kwargs
+    )
+    splitter.tokens_per_chunk = min(tokens_per_chunk, splitter.maximum_tokens_per_chunk)
+    return splitter
 
 
 class ChunkingService:
     """Service for chunking text using different strategies."""
     
-    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50):
+    def __init__(
+        self,
+        chunk_size: int = 500,
+        chunk_overlap: int = 50,
+        model_name: Optional[str] = None
+    ):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        # Tokenizer model for semantic chunking; pass the embedding model so
+        # chunk boundaries follow the same tokenization
+        self.model_name = model_name
+        self._fixed_splitter = _get_fixed_splitter(chunk_size, chunk_overlap)
     
     def chunk_fixed(self, text: str) -> List[str]:
         """
         Fixed-size chunking using RecursiveCharacterTextSplitter.
         Splits on paragraphs, then sentences, then characters.
         """
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        chunks = splitter.split_text(text)
-        return chunks
+        return self._fixed_splitter.split_text(text)
     
     def chunk_semantic(self, text: str) -> List[str]:
         """
         Semantic chunking using sentence transformers.
         Groups semantically similar sentences together.
         """
-        splitter = SentenceTransformersTokenTextSplitter(
-            chunk_overlap=self.chunk_overlap,
-            tokens_per_chunk=self.chunk_size // 4  # Approximate tokens
+        splitter = _get_semantic_splitter(
+            self.chunk_overlap,
+            self.chunk_size // 4,  # Approximate tokens
+            self.model_name
         )
-        chunks = splitter.split_text(text)
-        return chunks
+        return splitter.split_text(text)
     
-    async def chunk_text(
+    def chunk_text_sync(
         self,
         text: str,
         strategy: str = "fixed"
     ) -> List[str]:
-        """Chunk text using specified strategy."""
+        """Chunk text using specified strategy (blocking)."""
         if strategy == "fixed":
             return self.chunk_fixed(text)
         elif strategy == "semantic":
             return self.chunk_semantic(text)
         else:
-            raise ValueError(f"Unknown chunking strategy: {strategy}")
\ No newline at end of file
+            raise ValueError(f"Unknown chunking strategy: {strategy}")
+    
+    async def chunk_text(
+        self,
+        text: str,
+        strategy: str = "fixed"
+    ) -> List[str]:
+        """Chunk text using specified strategy."""
+        return self.chunk_text_sync(text, strategy)
+
+
+# Top-level entry points so they can be pickled and run in a process pool.
+def extract_text_sync(file_content: bytes, file_type: str) -> str:
+    """Extract text from file content of the given type ("pdf" or "txt")."""
+    if file_type == "pdf":
+        return TextExtractor.extract_pdf_sync(file_content)
+    return TextExtractor.extract_txt_sync(file_content)
+
+
+def chunk_text_sync(
+    text: str,
+    strategy: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    model_name: Optional[str] = None
+) -> List[str]:
+    """Chunk text with a fresh ChunkingService; splitters are cached per process."""
+    chunking_service = ChunkingService(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        model_name=model_name
+    )
+    return chunking_service.chunk_text_sync(text, strategy)